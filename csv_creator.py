@@ -1,8 +1,26 @@
 import os
 import csv
-from bs4 import BeautifulSoup
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer
 import re
 
+# Pre-compiled patterns and translation table, shared across all reports
+_UMLAUT_TABLE = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss', 'Ä': 'Ae', 'Ö': 'Oe', 'Ü': 'Ue'})
+_RE_NONWORD = re.compile(r'[^\w\s]')
+_RE_SEPARATORS = re.compile(r'[\s_]+')
+_RE_PA = re.compile(r'^PA \d+')
+
+# Only the document body is needed; skips building nodes for <head> (styles, scripts, meta)
+_BODY_ONLY = SoupStrainer('body')
+
+# Per-report parse cache, stored next to the reports.
+# Bump the version whenever parse_report_definitive changes its output.
+PARSE_CACHE_DIRNAME = '.parse_cache'
+PARSE_CACHE_VERSION = 1
+
 
 def clean_key(text):
     """
@@ -10,13 +28,11 @@ def clean_key(text):
     Removes special characters and normalizes spacing.
     """
     # Replace German Umlaute for cleaner keys
-    text = text.replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue').replace('ß', 'ss')
+    text = text.translate(_UMLAUT_TABLE)
     # Remove characters that are not alphanumeric, underscore, or space
-    text = re.sub(r'[^\w\s]', '', text)
-    # Replace spaces and multiple underscores with a single underscore
-    text = re.sub(r'\s+', '_', text)
-    text = re.sub(r'__+', '_', text)
-    return text.strip('_')
+    text = _RE_NONWORD.sub('', text)
+    # Replace any run of spaces and underscores with a single underscore
+    return _RE_SEPARATORS.sub('_', text).strip('_')
 
 
 def extract_key_value_pairs(table, prefix=""):
@@ -43,22 +59,55 @@ def extract_key_value_pairs(table, prefix=""):
     return data
 
 
+def find_landmarks(soup):
+    """
+    Walks the document once and collects the tags/strings that mark the start
+    of each report section, so the sections don't need separate full-tree searches.
+    The first occurrence wins, like soup.find().
+    """
+    landmarks = {'PA': [], 'h3': [], 'Berechnung': {}}
+    current_pa = None
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            if node == 'Prüfteil' or node == 'Prüfbereich':
+                landmarks.setdefault(str(node), node)
+        elif node.name == 'h3':
+            landmarks['h3'].append(node)
+        elif node.name == 'b':
+            text = node.string
+            if text is None:
+                continue
+            if text == 'Datum des Berichts' or text == 'Tabelle':
+                landmarks.setdefault(str(text), node)
+            elif text == 'Berechnung':
+                # Map each calculation block to the PA section it belongs to (keyed by id of the PA header)
+                if current_pa is not None:
+                    landmarks['Berechnung'].setdefault(id(current_pa), node)
+            elif _RE_PA.search(text):
+                landmarks['PA'].append(node)
+                current_pa = node
+    return landmarks
+
+
 def parse_report_definitive(html_content, filename):
     """
     Parses the HTML content of a single report file and extracts all data points
     with a robust, structure-aware method.
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    # Raw bytes are decoded by the parser itself, saving a separate decode pass
+    from_encoding = 'utf-8' if isinstance(html_content, bytes) else None
+    soup = BeautifulSoup(html_content, 'lxml', parse_only=_BODY_ONLY, from_encoding=from_encoding)
     report_data = {'Dateiname_Quelle': filename}
+    landmarks = find_landmarks(soup)
 
     # --- 1. General Info ---
-    general_header = soup.find('b', string='Datum des Berichts')
+    general_header = landmarks.get('Datum des Berichts')
     if general_header:
         table = general_header.find_parent('table')
         report_data.update(extract_key_value_pairs(table, "Allgemein"))
 
     # --- 2. PA Group Sections ---
-    pa_sections = soup.find_all('b', string=re.compile(r'^PA \d+'))
+    pa_sections = landmarks['PA']
     for pa_header in pa_sections:
         pa_prefix = clean_key(pa_header.get_text(strip=True))
 
@@ -81,31 +130,29 @@ def parse_report_definitive(html_content, filename):
                         blende_headers = [clean_key(b.get_text(strip=True)) for b in blende_rows[0].find_all('b')]
                         # Iterate data rows
                         for row in blende_rows[1:]:
-                            cells = row.find_all('td')
-                            blende_type = cells[0].get_text(strip=True)
+                            texts = [c.get_text(strip=True) for c in row.find_all('td')]
+                            blende_type = texts[0]
                             if blende_type:  # e.g., 'I', 'A', 'B'
-                                for k, header in enumerate(blende_headers[1:]):  # skip first header ('Blende')
-                                    if k + 1 < len(cells):
-                                        key = f"{pa_prefix}_Blende_{blende_type}_{header}"
-                                        report_data[key] = cells[k + 1].get_text(strip=True)
+                                # skip first header ('Blende') and first cell (the type)
+                                for header, text in zip(blende_headers[1:], texts[1:]):
+                                    report_data[f"{pa_prefix}_Blende_{blende_type}_{header}"] = text
 
         # --- Berechnung Section ---
-        calc_title_tag = soup.find('b', string='Berechnung')
+        # Find the title that belongs to this PA section
+        calc_title_tag = landmarks['Berechnung'].get(id(pa_header))
         if calc_title_tag:
-            # Find the correct title that belongs to this PA section
-            if calc_title_tag.find_previous('b', string=re.compile(r'^PA \d+')) == pa_header:
-                calc_table = calc_title_tag.find_next('table')
-                # It contains two sub-tables
-                for sub_table in calc_table.find_all('table'):
-                    report_data.update(extract_key_value_pairs(sub_table, f"{pa_prefix}_Berechnung"))
+            calc_table = calc_title_tag.find_next('table')
+            # It contains two sub-tables
+            for sub_table in calc_table.find_all('table'):
+                report_data.update(extract_key_value_pairs(sub_table, f"{pa_prefix}_Berechnung"))
 
     # --- 3. Prüfteil & Prüfbereich ---
-    part_header = soup.find(string='Prüfteil')
+    part_header = landmarks.get('Prüfteil')
     if part_header:
         table = part_header.find_next('table')
         report_data.update(extract_key_value_pairs(table.find('table'), "Pruefteil"))
 
-    area_header = soup.find(string='Prüfbereich')
+    area_header = landmarks.get('Prüfbereich')
     if area_header:
         container_table = area_header.find_next('table')
         # Two tables inside: area itself and encoders
@@ -117,16 +164,14 @@ def parse_report_definitive(html_content, filename):
             encoder_rows = area_tables[1].find_all('tr')
             encoder_headers = [clean_key(b.get_text(strip=True)) for b in encoder_rows[0].find_all('b')]
             for row in encoder_rows[1:]:
-                cells = row.find_all('td')
-                axis = cells[0].get_text(strip=True)
+                texts = [c.get_text(strip=True) for c in row.find_all('td')]
+                axis = texts[0]
                 if axis:
-                    for k, header in enumerate(encoder_headers):
-                        if k < len(cells):
-                            report_data[f"Pruefbereich_Weggeber_{axis}_{header}"] = cells[k].get_text(
-                                strip=True).replace('\n', ' ').strip()
+                    for header, text in zip(encoder_headers, texts):
+                        report_data[f"Pruefbereich_Weggeber_{axis}_{header}"] = text.replace('\n', ' ').strip()
 
     # --- 4. Main Indication Summary Table ---
-    main_indications_header = soup.find('b', string='Tabelle')
+    main_indications_header = landmarks.get('Tabelle')
     if main_indications_header:
         main_table = main_indications_header.find_next_sibling('table').find('table')
         rows = main_table.find_all('tr')
@@ -144,7 +189,7 @@ def parse_report_definitive(html_content, filename):
                 report_data[f"{prefix}_{header}"] = cells[i]
 
     # --- 5. Individual Indication Detail Tables ---
-    detail_headers = soup.find_all('h3')
+    detail_headers = landmarks['h3']
     for header in detail_headers:
         # Find all tables that follow an H3 tag until the next H3
         current_tag = header
@@ -177,47 +222,126 @@ def parse_report_definitive(html_content, filename):
     return report_data
 
 
-def convert_htm_to_csv(folder_path, output_csv_path):
-    """Main function to find, parse, and write CSV."""
-    all_data = []
+def _load_cached_report(cache_path, cache_key):
+    """Returns the cached report data if the cache entry matches cache_key, otherwise None."""
+    try:
+        with open(cache_path, 'rb') as f:
+            key, report_data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Truncated or foreign pickles can raise almost anything; the cache must
+        # never be fatal, so drop the entry and let the caller re-parse the file
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+    return report_data if key == cache_key else None
+
+
+def _parse_file(file_path, cache_dir=None):
+    """
+    Reads and parses a single report file. Defined at module level so it can
+    be pickled and run in a worker process.
+    If cache_dir is given, the result is cached per file and reused as long as
+    the file's modification time and size are unchanged.
+    """
+    filename = os.path.basename(file_path)
+    try:
+        cache_path = None
+        if cache_dir:
+            stat = os.stat(file_path)
+            cache_key = (PARSE_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+            cache_path = os.path.join(cache_dir, f"{filename}.pkl")
+            report_data = _load_cached_report(cache_path, cache_key)
+            if report_data is not None:
+                return report_data
+
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        report_data = parse_report_definitive(content, filename)
+    except Exception as e:
+        print(f"  Konnte {filename} nicht verarbeiten: {e}")
+        return None
+
+    if cache_path:
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump((cache_key, report_data), f, pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"  Cache fuer {filename} konnte nicht geschrieben werden: {e}")
+    return report_data
+
+
+def convert_htm_to_csv(folder_path, output_csv_path, use_cache=True):
+    """
+    Main function to find, parse, and write CSV.
+    Parsed reports are spooled to a temporary file while the column set is
+    collected, then streamed into the CSV, so only one report is held in memory.
+    With use_cache, parse results are kept in a cache folder next to the reports
+    and unchanged files are not parsed again on the next run.
+    """
+    report_count = 0
     all_fieldnames = set()
 
     print(f"Suche nach .htm/.html-Dateien im Ordner: {folder_path}...")
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(('.htm', '.html')):
-            file_path = os.path.join(folder_path, filename)
-            print(f"Verarbeite Datei: {filename}")
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                report_data = parse_report_definitive(content, filename)
+    filenames = [filename for filename in os.listdir(folder_path)
+                 if filename.lower().endswith(('.htm', '.html'))]
+    file_paths = [os.path.join(folder_path, filename) for filename in filenames]
+
+    cache_dir = None
+    if use_cache:
+        cache_dir = os.path.join(folder_path, PARSE_CACHE_DIRNAME)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Drop cache entries of reports that no longer exist
+            current_entries = {f"{filename}.pkl" for filename in filenames}
+            for entry in os.listdir(cache_dir):
+                if entry not in current_entries:
+                    os.remove(os.path.join(cache_dir, entry))
+        except OSError as e:
+            print(f"Parse-Cache deaktiviert: {e}")
+            cache_dir = None
+
+    with tempfile.TemporaryFile() as spool:
+        # Pass 1: parse all reports (independent and CPU-bound, so in parallel) and collect the columns
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for file_path, report_data in zip(file_paths, executor.map(_parse_file, file_paths, repeat(cache_dir), chunksize=8)):
+                print(f"Verarbeite Datei: {os.path.basename(file_path)}")
                 if report_data:
-                    all_data.append(report_data)
+                    pickle.dump(report_data, spool, pickle.HIGHEST_PROTOCOL)
+                    report_count += 1
                     all_fieldnames.update(report_data.keys())
-            except Exception as e:
-                print(f"  Konnte {filename} nicht verarbeiten: {e}")
-
-    if not all_data:
-        print("Keine gueltigen Berichtsdaten gefunden.")
-        return
-
-    print(f"\nSchreibe {len(all_data)} Berichte in die CSV-Datei: {output_csv_path}")
-    sorted_fieldnames = sorted(list(all_fieldnames))
 
-    try:
-        with open(output_csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=sorted_fieldnames)
-            writer.writeheader()
-            writer.writerows(all_data)
-        print("\nKonvertierung erfolgreich abgeschlossen!")
-        print(f"Die Datei wurde hier gespeichert: {output_csv_path}")
-    except Exception as e:
-        print(f"FEHLER beim Schreiben der CSV-Datei: {e}")
+        if not report_count:
+            print("Keine gueltigen Berichtsdaten gefunden.")
+            return
+
+        print(f"\nSchreibe {report_count} Berichte in die CSV-Datei: {output_csv_path}")
+        sorted_fieldnames = sorted(all_fieldnames)
+        # Fixed column positions, so each row is written as a plain list
+        column_index = {name: i for i, name in enumerate(sorted_fieldnames)}
+
+        # Pass 2: stream the spooled reports into the CSV
+        spool.seek(0)
+        try:
+            with open(output_csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(sorted_fieldnames)
+                for _ in range(report_count):
+                    report_data = pickle.load(spool)
+                    row = [''] * len(sorted_fieldnames)
+                    for key, value in report_data.items():
+                        row[column_index[key]] = value
+                    writer.writerow(row)
+            print("\nKonvertierung erfolgreich abgeschlossen!")
+            print(f"Die Datei wurde hier gespeichert: {output_csv_path}")
+        except Exception as e:
+            print(f"FEHLER beim Schreiben der CSV-Datei: {e}")
 
 
 if __name__ == '__main__':
     report_folder = "/Users/tobilindenau/Programmieren/RHB/RHB - Reports/Htm_Reports"
     output_csv = "/Users/tobilindenau/Programmieren/RHB/konvertierte_berichte_FINAL_v2.csv"
     convert_htm_to_csv(report_folder, output_csv)
-else:
-    print(f"Fehler: Der angegebene Ordner existiert nicht.")
@@ -1,6 +1,9 @@
+import os
 import pandas as pd
 import re
 
+_RE_IND_DETAIL = re.compile(r'Ind_(\d+)(?:\s\*)?_Detail_(A|DA|Gruppe|IUmr|Imr|Kanal|SA|Scan|vPa_A)$')
+
 def transform_csv_to_ml_long(input_csv_path, output_csv_path):
     """
     Transforms the wide format CSV (konvertierte_berichte_FINAL_v2.csv) 
@@ -13,130 +16,82 @@ def transform_csv_to_ml_long(input_csv_path, output_csv_path):
     print(f"Reading input CSV: {input_csv_path}")
     df = pd.read_csv(input_csv_path)
     
-    # Find all indication numbers
-    indication_numbers = set()
+    # Index the detail columns once: (indication, field) -> source column.
+    # Keep the first column if an indication appears both with and without the '*' marker
+    col_index = {}
     for col in df.columns:
-        match = re.match(r'Ind_(\d+)(?:\s\*)?_Detail_', col)
+        match = _RE_IND_DETAIL.match(col)
         if match:
-            indication_numbers.add(int(match.group(1)))
+            col_index.setdefault((int(match.group(1)), match.group(2)), col)
     
-    indication_numbers = sorted(indication_numbers)
-    print(f"Found indication numbers: {indication_numbers}")
+    detail_df = df[list(col_index.values())].astype(object)
+    detail_df.columns = pd.MultiIndex.from_tuples(list(col_index), names=['Indikation', 'Feld'])
     
-    # Initialize list to store transformed rows
-    transformed_rows = []
+    indication_numbers = sorted(detail_df.columns.get_level_values('Indikation').unique())
+    print(f"Found indication numbers: {indication_numbers}")
     
     # Define the indication columns that will be in the output (matching original structure)
     indication_columns = ['A', 'DA', 'Gruppe', 'IUmr', 'Imr', 'Kanal', 'SA', 'Scan', 'vPa_A']
     
-    # Process each row in the original CSV
-    for row_idx, row in df.iterrows():
-        print(f"Processing row {row_idx}...")
-        
-        # For each indication number, check if there's data and create a new row
-        for ind_num in indication_numbers:
-            # Check if this indication has any data (look for A value)
-            a_col_pattern = f'Ind_{ind_num}(?:\\s\*)?_Detail_A'
-            a_col = None
-            for col in df.columns:
-                if re.match(a_col_pattern, col):
-                    a_col = col
-                    break
-            
-            if a_col is None or pd.isna(row[a_col]) or row[a_col] == '':
-                continue  # Skip indications without data
-            
-            # Create new row for this indication
-            new_row = {}
-            new_row['Index'] = row_idx
-            new_row['Indikation'] = ind_num
-            
-            # Map each indication column
-            for col_name in indication_columns:
-                if col_name == 'Indikation':
-                    continue  # Already set above
-                
-                # Find the corresponding column in the source data
-                col_pattern = f'Ind_{ind_num}(?:\\s\*)?_Detail_{col_name}'
-                source_col = None
-                for col in df.columns:
-                    if re.match(col_pattern, col):
-                        source_col = col
-                        break
-                
-                if source_col and not pd.isna(row[source_col]):
-                    value = row[source_col]
-                    # Format values with appropriate units to match original exactly
-                    if col_name == 'A':
-                        new_row[col_name] = f"{value} %"
-                    elif col_name in ['DA', 'SA', 'vPa_A']:
-                        if str(value) == '---' or 'mm' in str(value):
-                            new_row[col_name] = '--- mm'
-                        else:
-                            new_row[col_name] = f"{float(value):.2f} mm"
-                    elif col_name in ['IUmr', 'Imr']:
-                        if str(value) == '---' or 'mm' in str(value):
-                            new_row[col_name] = '--- mm'
-                        else:
-                            new_row[col_name] = f"{float(value):.2f} mm"
-                    elif col_name == 'Scan':
-                        if str(value) == '---' or 'mm' in str(value):
-                            new_row[col_name] = '--- mm'
-                        else:
-                            new_row[col_name] = f"{float(value):.2f} mm"
-                    elif col_name == 'Gruppe':
-                        new_row[col_name] = f"{float(value):.1f}"
-                    elif col_name == 'Kanal':
-                        new_row[col_name] = str(value)
-                    else:
-                        new_row[col_name] = str(value)
-                else:
-                    # Handle missing values with appropriate units
-                    if col_name == 'A':
-                        new_row[col_name] = '--- %'
-                    elif col_name in ['DA', 'IUmr', 'Imr', 'SA', 'Scan', 'vPa_A']:
-                        new_row[col_name] = '--- mm'
-                    else:
-                        new_row[col_name] = '---'
-            
-            # Add the three PA configuration columns
-            new_row[' PA_1_rueckwaerts_Konfiguration_Verstaerkung'] = str(row.get('PA_1_rueckwaerts_Konfiguration_Verstaerkung', '---'))
-            # Second column uses PA_2_vorwaerts_Blende_I_Hoehe which contains "56.00 mm" values
-            blende_value = row.get('PA_2_vorwaerts_Blende_I_Hoehe', '---')
-            if blende_value != '---' and not pd.isna(blende_value):
-                new_row['PA_2_vorwaerts_Konfiguration_Verstaerkung'] = f"{blende_value} mm"
-            else:
-                new_row['PA_2_vorwaerts_Konfiguration_Verstaerkung'] = '--- mm'
-            # Third column uses the actual PA_2_vorwaerts_Konfiguration_Verstaerkung
-            new_row['PA_2_vorwaerts_Konfiguration_Verstaerkung_duplicate'] = str(row.get('PA_2_vorwaerts_Konfiguration_Verstaerkung', '---'))
-            
-            transformed_rows.append(new_row)
-    
-    # Create DataFrame from transformed rows
-    result_df = pd.DataFrame(transformed_rows)
-    
-    # Group by indication number to match original file structure
-    # Sort by Indikation first, then by original row order to group all rows of same indication together
-    result_df = result_df.sort_values(['Indikation']).reset_index(drop=True)
-    
-    # Re-assign sequential indices after sorting
-    result_df['Index'] = range(len(result_df))
-    
-    # Ensure column order matches the original exactly
-    expected_columns = ['Index', 'Indikation', 'A', 'DA', 'Gruppe', 'IUmr', 'Imr', 'Kanal', 'SA', 'Scan', 'vPa_A', ' PA_1_rueckwaerts_Konfiguration_Verstaerkung', 'PA_2_vorwaerts_Konfiguration_Verstaerkung', 'PA_2_vorwaerts_Konfiguration_Verstaerkung_duplicate']
-    
-    # Reorder columns to match expected order
-    result_df = result_df.reindex(columns=expected_columns, fill_value='---')
-    
-    # Rename the duplicate column to match the original (both columns have same name)
-    result_df.columns = ['Index', 'Indikation', 'A', 'DA', 'Gruppe', 'IUmr', 'Imr', 'Kanal', 'SA', 'Scan', 'vPa_A', ' PA_1_rueckwaerts_Konfiguration_Verstaerkung', 'PA_2_vorwaerts_Konfiguration_Verstaerkung', 'PA_2_vorwaerts_Konfiguration_Verstaerkung']
+    # Wide -> long: one row per (original row, indication), one column per field
+    long_df = detail_df.rename_axis('Index').melt(ignore_index=False).reset_index()
+    long_df = long_df.pivot(index=['Indikation', 'Index'], columns='Feld', values='value')
+    long_df = long_df.reindex(columns=indication_columns)
+    
+    # Skip indications without data (look for A value).
+    # The pivot index is already ordered by Indikation, then by original row order,
+    # which groups all rows of the same indication together as in the original file.
+    long_df = long_df[long_df['A'].notna() & (long_df['A'] != '')].reset_index()
+    
+    # Build the output columns directly in the expected order, with sequential indices
+    columns = {'Index': range(len(long_df)), 'Indikation': long_df['Indikation']}
+    
+    # Format values with appropriate units to match original exactly.
+    # Non-numeric entries ('---', values already carrying 'mm') become NaN and are shown as missing.
+    for col_name in indication_columns:
+        values = long_df[col_name]
+        if col_name == 'A':
+            columns[col_name] = values.astype(str) + ' %'
+        elif col_name == 'Gruppe':
+            num = pd.to_numeric(values, errors='coerce')
+            columns[col_name] = num.map("{:.1f}".format).where(num.notna(), '---')
+        elif col_name == 'Kanal':
+            columns[col_name] = values.astype(str).where(values.notna(), '---')
+        else:
+            num = pd.to_numeric(values, errors='coerce')
+            columns[col_name] = num.map("{:.2f} mm".format).where(num.notna(), '--- mm')
+    
+    # Add the three PA configuration columns, looked up from the originating row
+    def source_values(col):
+        if col not in df.columns:
+            return pd.Series('---', index=long_df.index, dtype=object)
+        return pd.Series(df[col].astype(object).reindex(long_df['Index']).to_numpy(), index=long_df.index)
+    
+    columns[' PA_1_rueckwaerts_Konfiguration_Verstaerkung'] = source_values('PA_1_rueckwaerts_Konfiguration_Verstaerkung').map(str)
+    # Second column uses PA_2_vorwaerts_Blende_I_Hoehe which contains "56.00 mm" values
+    columns['PA_2_vorwaerts_Konfiguration_Verstaerkung'] = source_values('PA_2_vorwaerts_Blende_I_Hoehe').map(
+        lambda value: f"{value} mm" if value != '---' and not pd.isna(value) else '--- mm')
+    # Third column uses the actual PA_2_vorwaerts_Konfiguration_Verstaerkung
+    columns['PA_2_vorwaerts_Konfiguration_Verstaerkung_duplicate'] = source_values('PA_2_vorwaerts_Konfiguration_Verstaerkung').map(str)
+    
+    result_df = pd.DataFrame(columns)
     
     print(f"Generated {len(result_df)} rows")
     
-    # Save to CSV
-    result_df.to_csv(output_csv_path, index=False)
+    # Save to CSV, renaming the duplicate column to match the original (both columns have same name)
+    csv_header = ['Index', 'Indikation', 'A', 'DA', 'Gruppe', 'IUmr', 'Imr', 'Kanal', 'SA', 'Scan', 'vPa_A', ' PA_1_rueckwaerts_Konfiguration_Verstaerkung', 'PA_2_vorwaerts_Konfiguration_Verstaerkung', 'PA_2_vorwaerts_Konfiguration_Verstaerkung']
+    result_df.to_csv(output_csv_path, index=False, header=csv_header)
     print(f"Saved to {output_csv_path}")
     
+    # Additionally save as Parquet for faster columnar loading in ML pipelines (requires pyarrow).
+    # Parquet needs unique column names, so the internal '_duplicate' name is kept there.
+    output_parquet_path = os.path.splitext(output_csv_path)[0] + '.parquet'
+    try:
+        result_df.to_parquet(output_parquet_path, index=False)
+        print(f"Saved to {output_parquet_path}")
+    except ImportError:
+        print("Skipping Parquet output (pyarrow is not installed)")
+    
     print(f"Transformation complete!")
     print(f"Original rows: {len(df)}")
     print(f"Transformed rows: {len(result_df)}")
@@ -4,6 +4,8 @@ import datetime
 import os
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 # --- Configuration ---
 # Load environment variables from .env file if it exists
@@ -23,6 +25,13 @@ APM_EQ_NUMBER = os.getenv("APM_EQ_NUMBER")
 APM_EQ_SSID = os.getenv("APM_EQ_SSID")
 APM_EQ_TYPE = os.getenv("APM_EQ_TYPE")
 
+# Upload mode: by default one data point every 15 seconds (simulated real-time streaming).
+# APM_BACKFILL=1 sends all rows without pacing over a pool of concurrent connections.
+APM_BACKFILL = os.getenv("APM_BACKFILL") == "1"
+APM_BACKFILL_WORKERS = int(os.getenv("APM_BACKFILL_WORKERS", 16))
+# APM_VERBOSE=1 prints the parsed API response for every data point
+VERBOSE = os.getenv("APM_VERBOSE") == "1"
+
 # Global variables for caching
 current_access_token = None
 token_expires_at = 0
@@ -128,6 +137,31 @@ def initialisiere_indikatoren():
             print(f"   -> API Antwort: {e.response.text}")
         return False
 
+def sende_datenpunkt(session, payload):
+    """Sendet einen einzelnen Datenpunkt über die gemeinsame Session an APM."""
+    try:
+        # Send data to APM
+        response = session.post(api_url, data=json.dumps(payload))
+        response.raise_for_status()
+        print("✅ Data sent successfully!")
+        
+        # Print response if available (only in verbose mode, parsing it costs time per row)
+        if VERBOSE and response.text:
+            try:
+                print("Response:", response.json())
+            except:
+                print("Response:", response.text)
+        return True
+                
+    except requests.exceptions.HTTPError as err:
+        print(f"❌ Error sending data to APM: {err}")
+        if hasattr(err, 'response') and err.response is not None:
+            print(f"Response: {err.response.text}")
+        return False
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return False
+
 def main():
     # Startet den Upload-Prozess für den Datensatz zu SAP APM
     print("🚀 Starting dataset upload to SAP APM...")
@@ -165,20 +199,36 @@ def main():
     success_count = 0
     failure_count = 0
     
-    # API Headers
-    api_headers = {
+    # Reuse one session (and its TCP/TLS connections) for all uploads
+    session = requests.Session()
+    session.headers.update({
         "Content-Type": "application/json",
         "Authorization": f"Bearer {access_token}",
         "X-API-Key": x_api_key
-    }
+    })
+    session.verify = False  # Only for testing!
+    session.mount("https://", HTTPAdapter(pool_maxsize=APM_BACKFILL_WORKERS))
     
-    print("\n📤 Sending data to APM (one data point every 15 seconds)...")
+    if APM_BACKFILL:
+        print(f"\n📤 Sending data to APM (backfill mode, {APM_BACKFILL_WORKERS} concurrent connections)...")
+    else:
+        print("\n📤 Sending data to APM (one data point every 15 seconds)...")
     
-    for idx, row in df.iterrows():
-        # Skip the target column if it exists
-        if 'Target' in row:
-            row = row.drop('Target')
-            
+    # Create reverse mapping from model feature names to characteristic IDs
+    model_feature_to_char_id = {v: k for k, v in char_id_to_name_map_global.items()}
+    
+    # Only the mapped feature columns are read, so access them as a plain array
+    # instead of boxing every row into a Series (the Target column is never touched).
+    # dtype=object keeps each column's own value type (no int -> float upcast in the payload).
+    feature_columns = [c for c in apm_merkmal_to_model_feature_name_map.values()
+                       if c in df.columns and c in model_feature_to_char_id]
+    features = [(model_feature_to_char_id[c], col) for col, c in enumerate(feature_columns)]
+    values = df[feature_columns].to_numpy(dtype=object)
+    missing = pd.isna(values)
+    n_rows = len(df)
+    
+    payloads = []
+    for idx in range(n_rows):
         # Create payload for this row
         # Use the position ID extracted from the API instead of environment variable
         payload = {
@@ -192,16 +242,15 @@ def main():
         # Hinweis: Die .env Datei muss die entsprechenden Variablen enthalten!
         
         # Add each feature value to the payload using actual characteristic IDs
-        # Create reverse mapping from model feature names to characteristic IDs
-        model_feature_to_char_id = {v: k for k, v in char_id_to_name_map_global.items()}
-        
-        for feature_name in apm_merkmal_to_model_feature_name_map.values():
-            if feature_name in row and not pd.isna(row[feature_name]) and feature_name in model_feature_to_char_id:
-                char_id = model_feature_to_char_id[feature_name]
+        # All features of a row share the same sample time
+        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        row_values, row_missing = values[idx], missing[idx]
+        for char_id, col in features:
+            if not row_missing[col]:
                 payload["values"].append({
                     "characteristicsInternalId": char_id,
-                    "value": str(row[feature_name]),
-                    "time": datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+                    "value": str(row_values[col]),
+                    "time": timestamp
                 })
 
         # --- ENDE: Werte hinzufügen ---
@@ -209,43 +258,36 @@ def main():
         # Skip if no valid data points
         if not payload["values"]:
             continue
+        
+        if APM_BACKFILL:
+            # Collected here and submitted concurrently below
+            payloads.append(payload)
+            continue
             
-        print(f"\n📤 Sending data point {idx + 1}/{len(df)}")
+        print(f"\n📤 Sending data point {idx + 1}/{n_rows}")
         print(f"Payload: {json.dumps(payload, indent=2)}")
         
-        try:
-            # Send data to APM
-            response = requests.post(
-                api_url,
-                headers=api_headers,
-                data=json.dumps(payload),
-                verify=False  # Only for testing!
-            )
-            response.raise_for_status()
-            print("✅ Data sent successfully!")
+        if sende_datenpunkt(session, payload):
             success_count += 1
-            
-            # Print response if available
-            if response.text:
-                try:
-                    print("Response:", response.json())
-                except:
-                    print("Response:", response.text)
-                    
-        except requests.exceptions.HTTPError as err:
-            print(f"❌ Error sending data to APM: {err}")
-            if hasattr(err, 'response') and err.response is not None:
-                print(f"Response: {err.response.text}")
-            failure_count += 1
-        except Exception as e:
-            print(f"❌ Unexpected error: {e}")
+        else:
             failure_count += 1
         
         # Wartet 15 Sekunden, bevor der nächste Datenpunkt gesendet wird (simuliert Echtzeit-Streaming)
-        if idx < len(df) - 1:  # Don't wait after the last row
+        if idx < n_rows - 1:  # Don't wait after the last row
             print("\n⏳ Waiting 15 seconds before sending next data point...")
             time.sleep(15)
     
+    if APM_BACKFILL and payloads:
+        print(f"\n📤 Sending {len(payloads)} data points...")
+        with ThreadPoolExecutor(max_workers=APM_BACKFILL_WORKERS) as executor:
+            for sent in executor.map(lambda p: sende_datenpunkt(session, p), payloads):
+                if sent:
+                    success_count += 1
+                else:
+                    failure_count += 1
+    
+    session.close()
+    
     # Gibt eine Zusammenfassung des Uploads aus
     print("\n📊 Upload Summary:")
     print(f"✅ Successfully sent: {success_count} rows")
@@ -2,23 +2,44 @@
 # HYBRID SERVER: Flask + Monitoring Loop für aicore
 # =============================================================================
 import os
+import logging
 import pickle
 from flask import Flask, request
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import re
 import time
+from contextlib import closing
 from datetime import datetime, timezone, timedelta
 from urllib.parse import quote
 import threading
+import signal
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
+from sklearn.pipeline import Pipeline
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import gzip
-import tempfile
 from dotenv import load_dotenv
-from dateutil import parser
+
+# Optional: orjson parst die (teils großen) APM-Antworten deutlich schneller als das json-Modul
+try:
+    import orjson
+
+    def _jloads(response):
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError as e:
+            # Wie response.json() als RequestException melden, damit die Fehlerbehandlung pro Request greift
+            raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos, response=response) from e
+except ImportError:
+    def _jloads(response):
+        return response.json()
 
 # =============================================================================
 # KONFIGURATION & INITIALISIERUNG
@@ -26,10 +47,19 @@ from dateutil import parser
 
 load_dotenv(override=True)
 
+# Log-Level über LOG_LEVEL steuerbar (z.B. DEBUG für detaillierte Request-/Response-Ausgaben)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+_log_level = logging.getLevelName(LOG_LEVEL)
+logging.basicConfig(level=_log_level if isinstance(_log_level, int) else logging.INFO,
+                    format="%(asctime)s %(levelname)s %(threadName)s: %(message)s")
+logger = logging.getLogger(__name__)
+if not isinstance(_log_level, int):
+    logger.warning("⚠️ Unbekanntes LOG_LEVEL '%s' - verwende INFO", LOG_LEVEL)
+
 app = Flask(__name__)
 
 # --- Laden der Konfiguration aus den Umgebungsvariablen ---
-print("Lade Konfiguration aus den Umgebungsvariablen...")
+logger.info("Lade Konfiguration aus den Umgebungsvariablen...")
 APM_OAUTH_TOKEN_URL = os.environ.get("APM_OAUTH_TOKEN_URL")
 APM_OAUTH_CLIENT_ID = os.environ.get("APM_OAUTH_CLIENT_ID")
 APM_OAUTH_CLIENT_SECRET = os.environ.get("APM_OAUTH_CLIENT_SECRET")
@@ -44,6 +74,21 @@ APM_EQ_SSID = os.environ.get("APM_EQ_SSID")
 APM_INDICATOR_DATA_ENDPOINT = os.environ.get("APM_INDICATOR_DATA_ENDPOINT")
 APM_TIMESERIES_ENDPOINT = os.environ.get("APM_TIMESERIES_ENDPOINT")
 POLLING_INTERVAL_SECONDS = int(os.environ.get("POLLING_INTERVAL_SECONDS", 15))
+# Obergrenze für das Polling-Intervall, wenn wiederholt keine neuen Messungen eintreffen
+MAX_POLLING_INTERVAL_SECONDS = int(os.environ.get("MAX_POLLING_INTERVAL_SECONDS", 120))
+# Sicherheitsabstand zum Ablauf des Access Tokens; die Hintergrund-Erneuerung startet
+# nochmals so viele Sekunden früher (bei kurzlebigen Tokens auf expires_in/4 begrenzt)
+OAUTH_REFRESH_BUFFER_SECONDS = int(os.environ.get("OAUTH_REFRESH_BUFFER_SECONDS", 60))
+
+# Indikator-Definitionen werden nach dieser Zeit neu vom IndicatorService geladen
+INDICATORS_TTL_S = int(os.environ.get("INDICATORS_TTL_S", 3600))
+# Mindestabstand zwischen zwei automatisch erstellten Alerts für dasselbe Equipment
+ALERT_COOLDOWN_S = int(os.environ.get("ALERT_COOLDOWN_S", 600))
+
+# Anzahl der Threads des WSGI-Servers (waitress) für die Flask-Routen
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", 8))
+# So lange dürfen laufende Requests bei SIGTERM noch zu Ende laufen, bevor Verbindungen hart geschlossen werden
+WSGI_SHUTDOWN_TIMEOUT_S = int(os.environ.get("WSGI_SHUTDOWN_TIMEOUT_S", 10))
 
 S3_BUCKET = os.environ.get("S3_BUCKET")
 MODEL_KEY = os.environ.get("MODEL_KEY")
@@ -63,13 +108,55 @@ APM_MERKMAL_TO_MODEL_FEATURE_MAP = {
 MERKMAL_NAMES = list(APM_MERKMAL_TO_MODEL_FEATURE_MAP.keys())
 FEATURE_NAMES = list(APM_MERKMAL_TO_MODEL_FEATURE_MAP.values())
 
+# Gemeinsame HTTP-Session für alle APM-Aufrufe (Keep-Alive, Connection-Pooling,
+# automatische Wiederholung bei vorübergehenden Gateway-Fehlern)
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+BASE_HEADERS = {"x-api-key": APM_X_API_KEY, "Accept": "application/json"}
+
+# Für die Laufzeit des Prozesses konstante Teile der APM-Requests
+TECH_OBJ_REF = [{"Number": APM_EQ_NUMBER, "SSID": APM_EQ_SSID, "Type": APM_EQ_TYPE}]
+INDICATOR_FILTER = f"technicalObject_number eq '{APM_EQ_NUMBER}' and technicalObject_SSID eq '{APM_EQ_SSID}' and technicalObject_type eq '{APM_EQ_TYPE}'"
+# OData-Key der Timeseries-URL: SSID/Typ/Nummer sind fest, nur Kategorie/Position/Zeitraum variieren
+ODATA_KEY_PREFIX = f"(SSID='{APM_EQ_SSID}',technicalObjectType='{APM_EQ_TYPE}',technicalObjectNumber='{APM_EQ_NUMBER}'"
+TS_URL_BASE = f"{APM_TIMESERIES_ENDPOINT}{ODATA_KEY_PREFIX}"
+INDICATOR_PARAMS = {
+    '$filter': INDICATOR_FILTER,
+    '$expand': 'characteristics($select=characteristicsName),category,positionDetails'
+}
+ALERT_PAYLOAD_TEMPLATE = {
+    "AlertType": APM_ALERT_TYPE,
+    "TriggeredOn": None,  # wird pro Alert gesetzt
+    "TechnicalObject": TECH_OBJ_REF,
+    "Source": "ML_Predictive_Maintenance_Server"
+}
+
 # Globale Variablen
 model = None
+NEEDS_DF = True  # Erwartet das Modell einen DataFrame mit Spaltennamen? Wird beim Laden bestimmt.
 current_access_token = None
-token_expires_at = 0
+token_expires_at = 0  # Ab hier gilt das Token für Aufrufer als abgelaufen
+token_refresh_at = 0  # Ab hier erneuert token_refresh_loop() das Token (vor token_expires_at)
+_token_lock = threading.Lock()
 indicator_definitions_global = []
 char_id_to_name_map_global = {}
+CHAR_ID_TO_COL = {}  # Characteristic-ID -> Spaltenindex in FEATURE_NAMES
+_indicators_loaded_at = 0.0
+_indicators_lock = threading.Lock()
 monitoring_active = False
+_shutdown = threading.Event()  # Beendet Monitoring- und Token-Schleife (SIGTERM oder /v2/stop)
+_monitoring_wakeup = threading.Event()  # Weckt die Monitoring-Schleife vorzeitig (neues Intervall oder Shutdown)
+_stoppe_wsgi_server = None  # Wird in __main__ gesetzt: beendet den laufenden WSGI-Server geordnet
+polling_interval_seconds = POLLING_INTERVAL_SECONDS  # Basis-Intervall, zur Laufzeit über /v2/polling-interval änderbar
+current_polling_interval = POLLING_INTERVAL_SECONDS
+_last_alert_at = None  # time.monotonic() des letzten erfolgreichen Alerts
+_suppressed_alerts = 0
+_last_prediction_key = None  # (Modell, eindeutige Feature-Zeilen) des letzten Zyklus
+_last_unique_predictions = None
 
 # =============================================================================
 # HILFSFUNKTIONEN (aus ursprünglichem Script)
@@ -78,96 +165,119 @@ monitoring_active = False
 def initialisiere_indikatoren():
     """
     Ruft die Definitionen aller relevanten Indikatoren
-    einmalig vom IndicatorService ab und speichert sie global.
+    vom IndicatorService ab und speichert sie global.
     """
-    global indicator_definitions_global, char_id_to_name_map_global
+    global indicator_definitions_global, char_id_to_name_map_global, CHAR_ID_TO_COL, _indicators_loaded_at
     
-    print("==========================================================")
-    print("INFO: Initialisiere Indikator-Definitionen...")
+    logger.info("Initialisiere Indikator-Definitionen...")
     
     access_token = hole_apm_access_token()
     if not access_token:
-        print("❌ FEHLER: Kein Access Token für die Initialisierung vorhanden.")
+        logger.error("❌ FEHLER: Kein Access Token für die Initialisierung vorhanden.")
         return False
 
-    headers = {"Authorization": f"Bearer {access_token}", "x-api-key": APM_X_API_KEY, "Accept": "application/json"}
-    
-    # Verwende die korrekte Filter-Struktur wie in der ursprünglichen Tutorial-Datei
-    filter_query = f"technicalObject_number eq '{APM_EQ_NUMBER}' and technicalObject_SSID eq '{APM_EQ_SSID}' and technicalObject_type eq '{APM_EQ_TYPE}'"
-    indicator_params = {
-        '$filter': filter_query,
-        '$expand': 'characteristics($select=characteristicsName),category,positionDetails'
-    }
+    headers = {**BASE_HEADERS, "Authorization": f"Bearer {access_token}"}
     
     try:
-        response = requests.get(APM_INDICATOR_DATA_ENDPOINT, headers=headers, params=indicator_params, timeout=15)
+        # Filter-Struktur wie in der ursprünglichen Tutorial-Datei (siehe INDICATOR_PARAMS)
+        response = SESSION.get(APM_INDICATOR_DATA_ENDPOINT, headers=headers, params=INDICATOR_PARAMS, timeout=15)
         response.raise_for_status()
-        indicator_definitions_global = response.json().get('value', [])
+        indicator_definitions = _jloads(response).get('value', [])
         
         # Reduziertes Logging - nur bei Bedarf aktivieren
-        # print("DEBUG: Vollständige Indikator-Definitionen von der API:")
-        # import json
-        # print(json.dumps(indicator_definitions_global, indent=2))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Vollständige Indikator-Definitionen von der API:\n%s", json.dumps(indicator_definitions, indent=2))
         
-        if not indicator_definitions_global:
-            print("⚠️ WARNUNG: Keine Indikatoren für das angegebene technische Objekt gefunden.")
+        # Leere Antwort als fehlgeschlagene Aktualisierung werten: bisherige Definitionen
+        # bleiben erhalten und der nächste Zyklus versucht es erneut
+        if not indicator_definitions:
+            logger.warning("⚠️ WARNUNG: Keine Indikatoren für das angegebene technische Objekt gefunden.")
             return False
         
-        char_id_to_name_map_global.clear()
-        
-        # Korrekte Mapping-Logik wie in der ursprünglichen Tutorial-Datei
-        for item in indicator_definitions_global:
+        # Korrekte Mapping-Logik wie in der ursprünglichen Tutorial-Datei.
+        # Neue Zuordnung erst komplett aufbauen und dann austauschen, damit ein
+        # gleichzeitiger Datenabruf nie eine halb gefüllte Zuordnung sieht.
+        char_id_to_name_map = {}
+        for item in indicator_definitions:
             name_from_api = item['characteristics'].get('characteristicsName')
             char_id = item.get('characteristics_characteristicsInternalId')
             
             if name_from_api in APM_MERKMAL_TO_MODEL_FEATURE_MAP:
                 korrekter_modell_name = APM_MERKMAL_TO_MODEL_FEATURE_MAP[name_from_api]
-                char_id_to_name_map_global[char_id] = korrekter_modell_name
+                char_id_to_name_map[char_id] = korrekter_modell_name
+        CHAR_ID_TO_COL = {char_id: FEATURE_NAMES.index(feature_name)
+                          for char_id, feature_name in char_id_to_name_map.items()}
+        indicator_definitions_global = indicator_definitions
+        char_id_to_name_map_global = char_id_to_name_map
+        _indicators_loaded_at = time.monotonic()
         
-        print(f"✅ {len(char_id_to_name_map_global)} Indikatoren erfolgreich zugeordnet.")
-        # print("INFO: Finale, korrigierte Zuordnung:", char_id_to_name_map_global)
-        print("==========================================================")
+        logger.info("✅ %d Indikatoren erfolgreich zugeordnet.", len(char_id_to_name_map_global))
+        logger.debug("Finale, korrigierte Zuordnung: %s", char_id_to_name_map_global)
         return True
         
     except requests.exceptions.RequestException as e:
-        print(f"❌ FEHLER bei der Initialisierung der Indikatoren (IndicatorService): {e}")
+        logger.error("❌ FEHLER bei der Initialisierung der Indikatoren (IndicatorService): %s", e)
         if hasattr(e, 'response') and e.response is not None:
-            print(f"   -> API Antwort: {e.response.text}")
+            logger.error("   -> API Antwort: %s", e.response.text)
         return False
     except Exception as e:
-        print(f"❌ UNERWARTETER FEHLER bei Indikator-Initialisierung: {e}")
+        logger.error("❌ UNERWARTETER FEHLER bei Indikator-Initialisierung: %s", e)
         return False
 
-# GEÄNDERT: Verwendet den dokumentierten /Measurements Endpunkt mit GET
-# HINWEIS: Fügen Sie 'dateutil.parser' zu Ihren Imports hinzu, falls noch nicht geschehen.
-# Sie können es mit 'pip install python-dateutil' installieren.
-from dateutil import parser
+_RE_SEKUNDENBRUCHTEIL = re.compile(r'(?<=:\d\d\.)\d+')
+
+def _parse_apm_zeitstempel(timestamp_str):
+    """Parst die ISO-8601-Zeitstempel von APM (z.B. '2024-01-01T12:00:00Z' oder mit Sekundenbruchteilen)."""
+    if timestamp_str.endswith('Z'):
+        timestamp_str = timestamp_str[:-1] + '+00:00'
+    # fromisoformat() akzeptiert vor Python 3.11 nur 3 oder 6 Nachkommastellen -> auf Mikrosekunden normieren
+    timestamp_str = _RE_SEKUNDENBRUCHTEIL.sub(lambda m: m.group()[:6].ljust(6, '0'), timestamp_str, count=1)
+    return datetime.fromisoformat(timestamp_str)
+
+def aktualisiere_indikatoren_bei_bedarf():
+    """
+    Lädt die Indikator-Definitionen neu, wenn die Zuordnung leer ist (z.B. nach
+    fehlgeschlagener Initialisierung) oder älter als INDICATORS_TTL_S.
+    """
+    def ist_aktuell():
+        return char_id_to_name_map_global and time.monotonic() - _indicators_loaded_at < INDICATORS_TTL_S
+    
+    if ist_aktuell():
+        return True
+    with _indicators_lock:
+        # Ein anderer Thread hat die Definitionen eventuell gerade neu geladen
+        if ist_aktuell():
+            return True
+        return initialisiere_indikatoren()
 
+# GEÄNDERT: Verwendet den dokumentierten /Measurements Endpunkt mit GET
 def hole_apm_sensor_daten(from_time_arg):
     """Ruft Sensordaten AB einem bestimmten Zeitstempel ab."""
-    global indicator_definitions_global, char_id_to_name_map_global
-    print(f"INFO: Rufe APM-Sensordaten ab seit {from_time_arg.isoformat()}...")
+    logger.info("Rufe APM-Sensordaten ab seit %s...", from_time_arg.isoformat())
     
     if not char_id_to_name_map_global:
-        print("❌ FEHLER: Indikator-Zuordnung ist leer. Datenabruf übersprungen.")
+        logger.error("❌ FEHLER: Indikator-Zuordnung ist leer. Datenabruf übersprungen.")
         return None, from_time_arg
     
     access_token = hole_apm_access_token()
     if not access_token:
-        print("❌ FEHLER: Kein Access Token für Sensordaten-Abruf vorhanden.")
+        logger.error("❌ FEHLER: Kein Access Token für Sensordaten-Abruf vorhanden.")
         return None, from_time_arg
 
-    headers = {"Authorization": f"Bearer {access_token}", "x-api-key": APM_X_API_KEY, "Accept": "application/json"}
-    
-    # Verwende die korrekte OData-Struktur wie in der ursprünglichen Tutorial-Datei
-    requests_to_make = {}
-    if indicator_definitions_global:
-        pos_id = indicator_definitions_global[0].get('positionDetails', {}).get('ID')
-        cat_name = indicator_definitions_global[0].get('category', {}).get('name')
-        if pos_id and cat_name:
-            requests_to_make[(pos_id, cat_name)] = []
+    # Position und Kategorie stammen aus der ersten Indikator-Definition
+    first_indicator = indicator_definitions_global[0] if indicator_definitions_global else {}
+    pos_id = first_indicator.get('positionDetails', {}).get('ID')
+    cat_name = first_indicator.get('category', {}).get('name')
+    if not (pos_id and cat_name):
+        logger.error("❌ FEHLER: Keine Position/Kategorie in den Indikator-Definitionen. Datenabruf übersprungen.")
+        return None, from_time_arg
+
+    headers = {**BASE_HEADERS, "Authorization": f"Bearer {access_token}"}
     
-    input_data = {}
+    matrix = np.empty((0, len(FEATURE_NAMES)))
+    row_timestamps = np.empty(0, dtype='datetime64[us]')
+    n_rows = 0
+    n_points = 0
     newest_timestamp_found = from_time_arg
     
     # Zeitbereich: von from_time_arg bis jetzt
@@ -178,135 +288,171 @@ def hole_apm_sensor_daten(from_time_arg):
     to_time_str = quote(to_time.strftime('%Y-%m-%dT%H:%M:%SZ'))
     from_time_str = quote(from_time.strftime('%Y-%m-%dT%H:%M:%SZ'))
     
-    # Durchlaufe alle gefundenen Position/Category-Kombinationen
-    for (pos_id, cat_name), _ in requests_to_make.items():
-        try:
-            # Baue OData-Key wie in der ursprünglichen Tutorial-Datei
-            odata_key = f"(SSID='{APM_EQ_SSID}',technicalObjectType='{APM_EQ_TYPE}',technicalObjectNumber='{APM_EQ_NUMBER}',categoryName='{cat_name}',positionID='{pos_id}',fromTime={from_time_str},toTime={to_time_str})"
-            full_url = f"{APM_TIMESERIES_ENDPOINT}{odata_key}"
-            
-            response = requests.get(full_url, headers=headers, timeout=15)
-            response.raise_for_status()
-            
-            measurement_values = response.json().get('values', [])
-            if len(measurement_values) > 0:
-                print(f"✅ {len(measurement_values)} empfangen")
-            
-            if not measurement_values:
-                continue
+    # Baue OData-Key wie in der ursprünglichen Tutorial-Datei
+    full_url = f"{TS_URL_BASE},categoryName='{cat_name}',positionID='{pos_id}',fromTime={from_time_str},toTime={to_time_str})"
+    
+    try:
+        response = SESSION.get(full_url, headers=headers, timeout=15)
+        response.raise_for_status()
+        
+        measurement_values = _jloads(response).get('values', [])
+        if len(measurement_values) > 0:
+            logger.info("✅ %d empfangen", len(measurement_values))
+        
+        # Verarbeite ALLE Messwerte (nicht nur den neuesten pro Merkmal) und schreibe sie
+        # direkt in eine Matrix mit einer Zeile pro Zeitstempel und einer Spalte pro Feature
+        matrix = np.full((len(measurement_values), len(FEATURE_NAMES)), np.nan)
+        row_timestamps = np.empty(len(measurement_values), dtype='datetime64[us]')
+        row_of_timestamp = {}
+        for value_point in measurement_values:
+            timestamp_str = value_point.get('time')
             
-            # Verarbeite ALLE Messwerte (nicht nur den neuesten pro Merkmal)
-            all_data_points = []
-            for value_point in measurement_values:
-                char_id = value_point.get('characteristicsInternalId')
-                timestamp_str = value_point.get('time')
-                value = value_point.get('value')
-                
-                # Den neuesten Zeitstempel in diesem Batch finden und aktualisieren
-                current_ts_obj = parser.parse(timestamp_str)
-                if current_ts_obj > newest_timestamp_found:
-                    newest_timestamp_found = current_ts_obj
-                
-                # Erstelle einen Datenpunkt für jede Messung
-                data_point = {}
+            # Ein fehlerhafter Messpunkt wird übersprungen, statt den ganzen Abruf abzubrechen
+            try:
+                row = row_of_timestamp.get(timestamp_str)
+                if row is None:
+                    current_ts_obj = _parse_apm_zeitstempel(timestamp_str)
+                    row = row_of_timestamp[timestamp_str] = len(row_of_timestamp)
+                    row_timestamps[row] = np.datetime64(current_ts_obj.astimezone(timezone.utc).replace(tzinfo=None), 'us')
                 
-                # Mappe Charakteristik-ID zu Feature-Name für diesen Datenpunkt
-                if char_id in char_id_to_name_map_global:
-                    feature_name = char_id_to_name_map_global[char_id]
-                    data_point[feature_name] = float(value)
-                    data_point['timestamp'] = timestamp_str
-                    
-                    # Füge diesen Datenpunkt zur Liste hinzu
-                    all_data_points.append(data_point)
-            
-            # Sammle alle Datenpunkte für die spätere Verarbeitung
-            input_data['all_points'] = all_data_points
-                    
-        except requests.exceptions.RequestException as e:
-            print(f"❌ FEHLER bei TimeseriesService für Position '{pos_id}': {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"DEBUG: HTTP Status: {e.response.status_code}")
-                print(f"DEBUG: API Antwort: {e.response.text[:500]}...")
-                print(f"DEBUG: Request URL: {full_url}")
-            import traceback
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
-            continue
+                # Bei mehrfachen Messungen eines Features gewinnt der zuletzt empfangene Wert
+                col = CHAR_ID_TO_COL.get(value_point.get('characteristicsInternalId'))
+                if col is not None:
+                    matrix[row, col] = float(value_point.get('value'))
+                    n_points += 1
+            except (AttributeError, TypeError, ValueError) as e:
+                logger.warning("⚠️ Ungültiger Messpunkt übersprungen (%s): %s", e, value_point)
+        n_rows = len(row_of_timestamp)
+
+    except requests.exceptions.RequestException as e:
+        logger.error("❌ FEHLER bei TimeseriesService für Position '%s': %s", pos_id, e)
+        if hasattr(e, 'response') and e.response is not None:
+            logger.debug("HTTP Status: %s", e.response.status_code)
+            logger.debug("API Antwort: %s...", e.response.text[:500])
+            logger.debug("Request URL: %s", full_url)
+        logger.debug("Traceback:", exc_info=True)
+    
+    # Den neuesten Zeitstempel in diesem Batch finden (auch von nicht zugeordneten Messungen)
+    if n_rows > 0:
+        newest_in_batch = row_timestamps[:n_rows].max().astype(datetime).replace(tzinfo=timezone.utc)
+        newest_timestamp_found = max(newest_timestamp_found, newest_in_batch)
     
     # Prüfe, ob neue Datenpunkte vorhanden sind
-    if not input_data or 'all_points' not in input_data or not input_data['all_points']:
-        print("ℹ️ Keine neuen Messungen seit dem letzten Abruf.")
+    if n_points == 0:
+        logger.info("ℹ️ Keine neuen Messungen seit dem letzten Abruf.")
         return None, newest_timestamp_found
+
+    logger.info("📊 %d Datenpunkte gesammelt für Analyse", n_points)
+
+    # Zeitstempel ohne zugeordnete Messung verwerfen, Zeilen chronologisch sortieren
+    matrix, row_timestamps = matrix[:n_rows], row_timestamps[:n_rows]
+    has_data = ~np.isnan(matrix).all(axis=1)
+    matrix, row_timestamps = matrix[has_data], row_timestamps[has_data]
+    order = np.argsort(row_timestamps, kind='stable')
     
-    print(f"📊 {len(input_data['all_points'])} Datenpunkte gesammelt für Analyse")
-    
+    input_data = {'matrix': matrix[order], 'timestamps': row_timestamps[order]}
     return input_data, newest_timestamp_found
 
 def lade_modell():
     """Lädt das ML-Modell aus einem AWS S3 Bucket."""
-    global model
+    global model, NEEDS_DF
     try:
-        print("INFO: Lade Modell von AWS S3...")
-        print(f"DEBUG: S3 Bucket: {S3_BUCKET}, Model Key: {MODEL_KEY}, Region: {AWS_REGION}")
-        s3_client = boto3.client('s3', region_name=AWS_REGION)
+        logger.info("Lade Modell von AWS S3...")
+        logger.debug("S3 Bucket: %s, Model Key: %s, Region: %s", S3_BUCKET, MODEL_KEY, AWS_REGION)
+        s3_client = boto3.client('s3', region_name=AWS_REGION,
+                                 config=Config(max_pool_connections=4, tcp_keepalive=True))
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.gz') as temp_file:
-            print(f"DEBUG: Download zu temporärer Datei: {temp_file.name}")
-            s3_client.download_file(S3_BUCKET, MODEL_KEY, temp_file.name)
-            
-            with gzip.open(temp_file.name, 'rb') as gz_file:
-                model = pickle.load(gz_file)
-            
-            os.unlink(temp_file.name)
+        # Modell direkt aus dem S3-Stream entpacken, ohne Umweg über eine temporäre Datei
+        # Den Stream auch bei Fehlern im Entpacken schließen, damit die Verbindung nicht offen bleibt
+        s3_object = s3_client.get_object(Bucket=S3_BUCKET, Key=MODEL_KEY)
+        with closing(s3_object['Body']) as body, gzip.GzipFile(fileobj=body) as gz_file:
+            model = pickle.load(gz_file)
+        
+        # Einmalig prüfen, ob das Modell mit Feature-Namen trainiert wurde
+        NEEDS_DF = hasattr(model, 'feature_names_in_') or isinstance(model, Pipeline)
         
-        print("✅ Modell erfolgreich geladen.")
-        print(f"DEBUG: Modell-Typ: {type(model)}")
+        logger.info("✅ Modell erfolgreich geladen.")
+        logger.debug("Modell-Typ: %s, DataFrame-Eingabe: %s", type(model), NEEDS_DF)
         return True
     except Exception as e:
-        print(f"❌ FEHLER beim Laden des Modells: {e}")
-        print(f"DEBUG: Detaillierter Fehler: {type(e).__name__}: {str(e)}")
-        import traceback
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        logger.error("❌ FEHLER beim Laden des Modells: %s", e)
+        logger.debug("Detaillierter Fehler: %s: %s", type(e).__name__, e, exc_info=True)
         return False
 
-def hole_apm_access_token():
-    """Holt ein OAuth2 Access Token von SAP APM und nutzt einen Cache."""
-    global current_access_token, token_expires_at
-    
-    if current_access_token and time.time() < token_expires_at:
-        return current_access_token
-    
-    print("INFO: Fordere neues SAP APM Access Token an...")
-    print(f"DEBUG: OAuth URL: {APM_OAUTH_TOKEN_URL}")
-    print(f"DEBUG: Client ID: {APM_OAUTH_CLIENT_ID[:8]}...")
-    
-    try:
-        response = requests.post(APM_OAUTH_TOKEN_URL, data={
-            'grant_type': 'client_credentials',
-            'client_id': APM_OAUTH_CLIENT_ID,
-            'client_secret': APM_OAUTH_CLIENT_SECRET
-        }, timeout=10)
-        response.raise_for_status()
+def _refresh_token(force=False):
+    """
+    Fordert ein neues OAuth2 Access Token von SAP APM an und aktualisiert den Cache.
+    Mit force=True (Hintergrund-Erneuerung) wird schon ab token_refresh_at erneuert,
+    also bevor Aufrufer das Token als abgelaufen betrachten.
+    """
+    global current_access_token, token_expires_at, token_refresh_at
+    
+    # Nur ein Thread darf gleichzeitig ein Token anfordern
+    with _token_lock:
+        # Double-checked Locking: Wer auf den Lock gewartet hat, nutzt das
+        # soeben von einem anderen Thread geholte Token statt erneut anzufragen
+        valid_until = token_refresh_at if force else token_expires_at
+        if current_access_token and time.monotonic() < valid_until:
+            return current_access_token
         
-        token_data = response.json()
-        current_access_token = token_data['access_token']
-        expires_in = token_data.get('expires_in', 3600)
-        token_expires_at = time.time() + expires_in - 60
+        logger.info("Fordere neues SAP APM Access Token an...")
+        logger.debug("OAuth URL: %s", APM_OAUTH_TOKEN_URL)
+        logger.debug("Client ID: %s...", (APM_OAUTH_CLIENT_ID or "")[:8])
         
-        print("✅ Neues Access Token erhalten.")
-        print(f"DEBUG: Token gültig für {expires_in} Sekunden")
+        response = None
+        # Ablaufzeit ab dem Absenden rechnen, nicht ab Eingang der Antwort
+        requested_at = time.monotonic()
+        try:
+            response = SESSION.post(APM_OAUTH_TOKEN_URL, data={
+                'grant_type': 'client_credentials',
+                'client_id': APM_OAUTH_CLIENT_ID,
+                'client_secret': APM_OAUTH_CLIENT_SECRET
+            }, timeout=10)
+            response.raise_for_status()
+            
+            token_data = _jloads(response)
+            current_access_token = token_data['access_token']
+            expires_in = token_data.get('expires_in', 3600)
+            # Puffer begrenzen, damit auch kurzlebige Tokens nicht schon beim Eintreffen abgelaufen sind
+            buffer_seconds = min(OAUTH_REFRESH_BUFFER_SECONDS, expires_in // 4)
+            token_expires_at = requested_at + expires_in - buffer_seconds
+            token_refresh_at = token_expires_at - buffer_seconds
+            
+            logger.info("✅ Neues Access Token erhalten.")
+            logger.debug("Token gültig für %s Sekunden", expires_in)
+            return current_access_token
+        except Exception as e:
+            logger.error("❌ FEHLER beim Abrufen des Access Tokens: %s", e)
+            logger.debug("Response Status: %s", getattr(response, 'status_code', 'N/A'))
+            logger.debug("Response Text: %s...", getattr(response, 'text', 'N/A')[:200])
+            logger.debug("Traceback:", exc_info=True)
+            # Ein noch gültiges Token bleibt im Cache, bis es für Aufrufer abläuft
+            return None
+
+def hole_apm_access_token():
+    """
+    Liefert das gecachte OAuth2 Access Token. Die Erneuerung übernimmt
+    token_refresh_loop(); synchron angefordert wird nur, wenn noch kein
+    gültiges Token vorliegt (Kaltstart oder verpasste Erneuerung).
+    """
+    if current_access_token and time.monotonic() < token_expires_at:
         return current_access_token
-    except Exception as e:
-        print(f"❌ FEHLER beim Abrufen des Access Tokens: {e}")
-        print(f"DEBUG: Response Status: {getattr(response, 'status_code', 'N/A')}")
-        print(f"DEBUG: Response Text: {getattr(response, 'text', 'N/A')[:200]}...")
-        import traceback
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
-        current_access_token, token_expires_at = None, 0
-        return None
+    return _refresh_token()
+
+def token_refresh_loop():
+    """Erneuert das Access Token im Hintergrund, bevor es für Aufrufer abläuft."""
+    while not _shutdown.is_set():
+        # Mindestens 1s warten, damit ein sofort fälliges Token keine OAuth-Anfragen in Endlosschleife auslöst
+        if _shutdown.wait(max(1, token_refresh_at - time.monotonic())):
+            break
+        if _refresh_token(force=True) is None:
+            # Fehlgeschlagene Erneuerung nach kurzer Pause wiederholen
+            if _shutdown.wait(POLLING_INTERVAL_SECONDS):
+                break
 
 def test_network_connectivity():
     """Testet die Netzwerkverbindung zu APM-Endpunkten."""
-    print("\n=== NETZWERK-KONNEKTIVITÄTS-TEST ===")
+    logger.info("=== NETZWERK-KONNEKTIVITÄTS-TEST ===")
     
     endpoints_to_test = [
         ("OAuth Token URL", APM_OAUTH_TOKEN_URL),
@@ -319,44 +465,48 @@ def test_network_connectivity():
     
     for name, url in endpoints_to_test:
         if not url:
-            print(f"❌ {name}: URL nicht konfiguriert")
+            logger.error("❌ %s: URL nicht konfiguriert", name)
             connectivity_results[name] = False
             continue
             
         try:
-            print(f"🔍 Teste {name}: {url}")
+            logger.info("🔍 Teste %s: %s", name, url)
             # Nur HEAD Request für schnelleren Test
-            response = requests.head(url, timeout=10)
+            response = SESSION.head(url, timeout=10)
             if response.status_code < 500:  # Alles unter 500 ist erreichbar
-                print(f"✅ {name}: Erreichbar (Status: {response.status_code})")
+                logger.info("✅ %s: Erreichbar (Status: %s)", name, response.status_code)
                 connectivity_results[name] = True
             else:
-                print(f"⚠️ {name}: Server-Fehler (Status: {response.status_code})")
+                logger.warning("⚠️ %s: Server-Fehler (Status: %s)", name, response.status_code)
                 connectivity_results[name] = False
         except requests.exceptions.Timeout:
-            print(f"❌ {name}: Timeout - Endpunkt nicht erreichbar")
+            logger.error("❌ %s: Timeout - Endpunkt nicht erreichbar", name)
             connectivity_results[name] = False
         except requests.exceptions.ConnectionError:
-            print(f"❌ {name}: Verbindungsfehler - Endpunkt nicht erreichbar")
+            logger.error("❌ %s: Verbindungsfehler - Endpunkt nicht erreichbar", name)
             connectivity_results[name] = False
         except Exception as e:
-            print(f"❌ {name}: Unerwarteter Fehler - {e}")
+            logger.error("❌ %s: Unerwarteter Fehler - %s", name, e)
             connectivity_results[name] = False
     
-    print("=== ENDE NETZWERK-TEST ===\n")
+    logger.info("=== ENDE NETZWERK-TEST ===")
     return connectivity_results
 
+def _maskierte_header(headers):
+    """Header-Kopie mit maskierten Zugangsdaten für das Debug-Logging."""
+    return {k: '***' if k in ('Authorization', 'x-api-key') else v for k, v in headers.items()}
+
 def erstelle_apm_alert():
     """Erstellt den Alert in SAP APM mit detailliertem Logging für Debugging."""
-    print("\n=== ALERT CREATION DEBUG INFO ===")
+    logger.debug("=== ALERT CREATION DEBUG INFO ===")
     
     # 1. Überprüfe Umgebungsvariablen
-    print(f"APM_ALERT_CREATION_ENDPOINT: {APM_ALERT_CREATION_ENDPOINT}")
-    print(f"APM_ALERT_TYPE: {APM_ALERT_TYPE}")
-    print(f"APM_EQ_NUMBER: {APM_EQ_NUMBER}")
-    print(f"APM_EQ_SSID: {APM_EQ_SSID}")
-    print(f"APM_EQ_TYPE: {APM_EQ_TYPE}")
-    print(f"APM_X_API_KEY: {'***' if APM_X_API_KEY else 'NICHT GESETZT'}")
+    logger.debug("APM_ALERT_CREATION_ENDPOINT: %s", APM_ALERT_CREATION_ENDPOINT)
+    logger.debug("APM_ALERT_TYPE: %s", APM_ALERT_TYPE)
+    logger.debug("APM_EQ_NUMBER: %s", APM_EQ_NUMBER)
+    logger.debug("APM_EQ_SSID: %s", APM_EQ_SSID)
+    logger.debug("APM_EQ_TYPE: %s", APM_EQ_TYPE)
+    logger.debug("APM_X_API_KEY: %s", '***' if APM_X_API_KEY else 'NICHT GESETZT')
     
     # Überprüfe kritische Variablen
     missing_vars = []
@@ -370,16 +520,16 @@ def erstelle_apm_alert():
         missing_vars.append("APM_X_API_KEY")
         
     if missing_vars:
-        print(f"❌ FEHLER: Fehlende Umgebungsvariablen für Alert: {', '.join(missing_vars)}")
+        logger.error("❌ FEHLER: Fehlende Umgebungsvariablen für Alert: %s", ', '.join(missing_vars))
         return False
     
     # 2. Access Token holen
-    print("\n--- Hole Access Token ---")
+    logger.debug("--- Hole Access Token ---")
     access_token = hole_apm_access_token()
     if not access_token:
-        print("❌ FEHLER: Kein Access Token für APM-Alert vorhanden.")
+        logger.error("❌ FEHLER: Kein Access Token für APM-Alert vorhanden.")
         return False
-    print(f"✅ Access Token erhalten (Länge: {len(access_token)})")
+    logger.debug("✅ Access Token erhalten (Länge: %d)", len(access_token))
 
     # 3. Request vorbereiten
     headers = {
@@ -388,145 +538,158 @@ def erstelle_apm_alert():
         "Content-Type": "application/json"
     }
     
-    payload = {
-        "AlertType": APM_ALERT_TYPE,
-        "TriggeredOn": datetime.now(timezone.utc).isoformat(),
-        "TechnicalObject": [{"Number": APM_EQ_NUMBER, "SSID": APM_EQ_SSID, "Type": APM_EQ_TYPE}],
-        "Source": "ML_Predictive_Maintenance_Server"
-    }
+    payload = {**ALERT_PAYLOAD_TEMPLATE, "TriggeredOn": datetime.now(timezone.utc).isoformat()}
     
-    print(f"\n--- Request Details ---")
-    print(f"URL: {APM_ALERT_CREATION_ENDPOINT}")
-    print(f"Headers: {dict((k, '***' if k == 'Authorization' or k == 'x-api-key' else v) for k, v in headers.items())}")
-    print(f"Payload: {json.dumps(payload, indent=2)}")
+    # Maskierte Header und formatierte Payload nur aufbauen, wenn DEBUG-Logging aktiv ist
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("--- Request Details ---")
+        logger.debug("URL: %s", APM_ALERT_CREATION_ENDPOINT)
+        logger.debug("Headers: %s", _maskierte_header(headers))
+        logger.debug("Payload: %s", json.dumps(payload, indent=2))
 
     # 4. Request senden
     try:
-        print(f"\n--- Sende Alert an SAP APM ---")
-        response = requests.post(
+        logger.debug("--- Sende Alert an SAP APM ---")
+        response = SESSION.post(
             APM_ALERT_CREATION_ENDPOINT, 
             headers=headers, 
             json=payload, 
             timeout=30
         )
         
-        print(f"Response Status Code: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
+        logger.debug("Response Status Code: %s", response.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response Headers: %s", dict(response.headers))
         
         if response.status_code == 200 or response.status_code == 201:
-            print(f"✅ Alert erfolgreich erstellt. Status: {response.status_code}")
-            try:
-                response_json = response.json()
-                print(f"Response Body: {json.dumps(response_json, indent=2)}")
-            except:
-                print(f"Response Body (Text): {response.text}")
+            logger.info("✅ Alert erfolgreich erstellt. Status: %s", response.status_code)
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    response_json = _jloads(response)
+                    logger.debug("Response Body: %s", json.dumps(response_json, indent=2))
+                except:
+                    logger.debug("Response Body (Text): %s", response.text)
             return True
         else:
-            print(f"❌ Alert-Erstellung fehlgeschlagen. Status: {response.status_code}")
-            print(f"Response Body: {response.text}")
+            logger.error("❌ Alert-Erstellung fehlgeschlagen. Status: %s", response.status_code)
+            logger.error("Response Body: %s", response.text)
             
             if response.status_code == 401:
-                print("   -> DIAGNOSE: Authentifizierungsfehler - Token ungültig oder abgelaufen")
+                logger.error("   -> DIAGNOSE: Authentifizierungsfehler - Token ungültig oder abgelaufen")
             elif response.status_code == 403:
-                print("   -> DIAGNOSE: Autorisierungsfehler - Keine Berechtigung für Alert-Erstellung")
+                logger.error("   -> DIAGNOSE: Autorisierungsfehler - Keine Berechtigung für Alert-Erstellung")
             elif response.status_code == 404:
-                print("   -> DIAGNOSE: Endpoint nicht gefunden - URL möglicherweise falsch")
+                logger.error("   -> DIAGNOSE: Endpoint nicht gefunden - URL möglicherweise falsch")
             elif response.status_code == 422:
-                print("   -> DIAGNOSE: Ungültige Daten - Payload-Format oder -Inhalt fehlerhaft")
+                logger.error("   -> DIAGNOSE: Ungültige Daten - Payload-Format oder -Inhalt fehlerhaft")
             elif response.status_code >= 500:
-                print("   -> DIAGNOSE: Server-Fehler auf APM-Seite")
+                logger.error("   -> DIAGNOSE: Server-Fehler auf APM-Seite")
             
             return False
             
     except requests.exceptions.Timeout as e:
-        print(f"❌ TIMEOUT beim Senden des Alerts: {e}")
-        print("   -> DIAGNOSE: Netzwerk-Timeout - möglicherweise langsame Verbindung in aicore")
+        logger.error("❌ TIMEOUT beim Senden des Alerts: %s", e)
+        logger.error("   -> DIAGNOSE: Netzwerk-Timeout - möglicherweise langsame Verbindung in aicore")
         return False
     except requests.exceptions.ConnectionError as e:
-        print(f"❌ VERBINDUNGSFEHLER beim Senden des Alerts: {e}")
-        print("   -> DIAGNOSE: Kann APM-Endpoint nicht erreichen")
+        logger.error("❌ VERBINDUNGSFEHLER beim Senden des Alerts: %s", e)
+        logger.error("   -> DIAGNOSE: Kann APM-Endpoint nicht erreichen")
         return False
     except requests.exceptions.RequestException as e:
-        print(f"❌ ALLGEMEINER FEHLER beim Senden des Alerts: {e}")
+        logger.error("❌ ALLGEMEINER FEHLER beim Senden des Alerts: %s", e)
         if hasattr(e, 'response') and e.response is not None:
-            print(f"   -> API Antwort Status: {e.response.status_code}")
-            print(f"   -> API Antwort Body: {e.response.text}")
+            logger.error("   -> API Antwort Status: %s", e.response.status_code)
+            logger.error("   -> API Antwort Body: %s", e.response.text)
         return False
     except Exception as e:
-        print(f"❌ UNERWARTETER FEHLER beim Alert-Senden: {type(e).__name__}: {e}")
-        import traceback
-        print(f"   -> Traceback: {traceback.format_exc()}")
+        logger.error("❌ UNERWARTETER FEHLER beim Alert-Senden: %s: %s", type(e).__name__, e)
+        logger.debug("   -> Traceback:", exc_info=True)
         return False
     finally:
-        print("=== END ALERT CREATION DEBUG ===")
+        logger.debug("=== END ALERT CREATION DEBUG ===")
+
+def _modell_eingabe(feature_array):
+    """Gibt das Feature-Array nur dann als DataFrame weiter, wenn das Modell Spaltennamen erwartet."""
+    if NEEDS_DF:
+        return pd.DataFrame(feature_array, columns=FEATURE_NAMES)
+    return feature_array
+
+def sage_vorher_dedupliziert(feature_array):
+    """
+    Vorhersage nur für eindeutige Feature-Zeilen; identische Zeilen erhalten dasselbe Ergebnis.
+    Sind die eindeutigen Zeilen exakt dieselben wie im letzten Zyklus (stabiler Maschinenzustand),
+    wird das letzte Ergebnis ohne erneuten Modellaufruf wiederverwendet.
+    """
+    global _last_prediction_key, _last_unique_predictions
+    
+    unique_rows, inverse = np.unique(feature_array, axis=0, return_inverse=True)
+    cache_key = (id(model), unique_rows.tobytes())
+    if cache_key == _last_prediction_key:
+        logger.debug("Feature-Zeilen unverändert - verwende letzte Vorhersage")
+        unique_predictions = _last_unique_predictions
+    else:
+        unique_predictions = model.predict(_modell_eingabe(unique_rows))
+        _last_prediction_key, _last_unique_predictions = cache_key, unique_predictions
+    return unique_predictions[inverse.ravel()]
 
 def fuehre_vorhersage_aus(sensor_data):
     """Verarbeitet alle Datenpunkte und führt Vorhersagen für jeden aus."""
+    global _last_alert_at, _suppressed_alerts
+    
     if model is None:
-        print("❌ FEHLER: Modell ist nicht geladen. Kann keine Vorhersage durchführen.")
+        logger.error("❌ FEHLER: Modell ist nicht geladen. Kann keine Vorhersage durchführen.")
         return
 
-    if not sensor_data or 'all_points' not in sensor_data:
-        print("❌ FEHLER: Keine Datenpunkte für Vorhersage vorhanden.")
+    if not sensor_data or 'matrix' not in sensor_data:
+        logger.error("❌ FEHLER: Keine Datenpunkte für Vorhersage vorhanden.")
         return
-        
-    all_data_points = sensor_data['all_points']
-    if not all_data_points:
-        print("ℹ️ Keine neuen Datenpunkte für Analyse vorhanden.")
+
+    feature_array = sensor_data['matrix']
+    timestamps = sensor_data['timestamps']
+    if len(feature_array) == 0:
+        logger.info("ℹ️ Keine neuen Datenpunkte für Analyse vorhanden.")
         return
 
     try:
-        # Gruppiere Datenpunkte nach Zeitstempel für vollständige Feature-Sets
-        timestamp_groups = {}
-        for point in all_data_points:
-            timestamp = point.get('timestamp')
-            if timestamp not in timestamp_groups:
-                timestamp_groups[timestamp] = {}
-            
-            # Füge alle Features dieses Datenpunkts zur Zeitstempel-Gruppe hinzu
-            for feature, value in point.items():
-                if feature != 'timestamp':
-                    timestamp_groups[timestamp][feature] = value
-        
-        print(f"📊 Analysiere {len(timestamp_groups)} Datenpunkt-Gruppen...")
-        
-        failure_risk_count = 0
-        total_predictions = 0
-        
-        # Verarbeite jede Zeitstempel-Gruppe separat
-        for timestamp, features in timestamp_groups.items():
-            # Füge Type-Mapping hinzu
-            type_mapping = {'L': 0.0, 'M': 1.0, 'H': 2.0}
-            features['Type'] = type_mapping.get(APM_EQ_TYPE, 0.0)
-            
-            # Stelle sicher, dass alle erforderlichen Features vorhanden sind
-            input_data = {}
-            for feature in FEATURE_NAMES:
-                input_data[feature] = features.get(feature, 0.0)
-            
-            # Erstelle DataFrame für diesen Datenpunkt
-            input_df = pd.DataFrame([input_data], columns=FEATURE_NAMES).fillna(0.0)
-            
-            # Führe Vorhersage aus
-            prediction = model.predict(input_df[FEATURE_NAMES])[0]
-            total_predictions += 1
-            
-            # Prüfe auf Ausfallrisiko (Annahme: 1 = Ausfallrisiko, 0 = Normal)
-            if prediction == 1:
-                failure_risk_count += 1
-                print(f"🔴 Ausfallrisiko erkannt um {timestamp}!")
+        # Die Matrix enthält bereits eine Zeile pro Zeitstempel (Spalten in FEATURE_NAMES-Reihenfolge)
+        logger.info("📊 Analysiere %d Datenpunkt-Gruppen...", len(feature_array))
+
+        # Fehlende Features werden mit 0.0 aufgefüllt, Type-Mapping ist für alle Zeitstempel gleich
+        np.nan_to_num(feature_array, nan=0.0, copy=False)
+        type_mapping = {'L': 0.0, 'M': 1.0, 'H': 2.0}
+        feature_array[:, FEATURE_NAMES.index('Type')] = type_mapping.get(APM_EQ_TYPE, 0.0)
+
+        # Alle Vorhersagen in einem einzigen Aufruf (doppelte Zeilen nur einmal)
+        predictions = sage_vorher_dedupliziert(feature_array)
+
+        # Prüfe auf Ausfallrisiko (Annahme: 1 = Ausfallrisiko, 0 = Normal)
+        total_predictions = len(predictions)
+        risk_indices = np.flatnonzero(predictions == 1)
+        failure_risk_count = len(risk_indices)
+        for i in risk_indices:
+            logger.info("🔴 Ausfallrisiko erkannt um %s!", np.datetime_as_string(timestamps[i], unit='ms', timezone='UTC'))
         
         # Zusammenfassung und Alert-Entscheidung
         if failure_risk_count > 0:
-            print(f"⚠️ {failure_risk_count}/{total_predictions} Datenpunkte zeigen Ausfallrisiko! Alert wird erstellt...")
-            erstelle_apm_alert()
+            now = time.monotonic()
+            if _last_alert_at is None or now - _last_alert_at >= ALERT_COOLDOWN_S:
+                logger.warning("⚠️ %d/%d Datenpunkte zeigen Ausfallrisiko! Alert wird erstellt...", failure_risk_count, total_predictions)
+                # Cooldown nur nach erfolgreichem Alert starten, damit Fehlschläge im nächsten Zyklus wiederholt werden
+                if erstelle_apm_alert():
+                    _last_alert_at = now
+                    _suppressed_alerts = 0
+            else:
+                _suppressed_alerts += 1
+                remaining = int(ALERT_COOLDOWN_S - (now - _last_alert_at))
+                logger.warning("⏸️ %d/%d Datenpunkte zeigen Ausfallrisiko - Alert unterdrückt "
+                               "(Cooldown noch %ds, %d unterdrückt seit letztem Alert)",
+                               failure_risk_count, total_predictions, remaining, _suppressed_alerts)
         else:
-            print(f"✅ Kein Ausfallrisiko festgestellt ({total_predictions} Datenpunkte analysiert)")
+            logger.info("✅ Kein Ausfallrisiko festgestellt (%d Datenpunkte analysiert)", total_predictions)
 
     except Exception as e:
-        print(f"❌ FEHLER bei der Batch-Vorhersage: {e}")
-        import traceback
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        logger.error("❌ FEHLER bei der Batch-Vorhersage: %s", e)
+        logger.debug("Traceback:", exc_info=True)
 
 # =============================================================================
 # FLASK ROUTEN FÜR HEALTH CHECKS UND DEBUGGING
@@ -602,11 +765,8 @@ def predict():
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }, 400
         
-        # Konvertiere zu DataFrame
-        input_df = pd.DataFrame([data])
-        
         # Prüfe, ob alle erforderlichen Features vorhanden sind
-        missing_features = [feature for feature in FEATURE_NAMES if feature not in input_df.columns]
+        missing_features = [feature for feature in FEATURE_NAMES if feature not in data]
         if missing_features:
             return {
                 "error": f"Fehlende Features: {missing_features}",
@@ -614,8 +774,28 @@ def predict():
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }, 400
         
+        # Modelle mit Spaltennamen (z.B. Pipelines mit Encodern) erhalten die Rohwerte wie bisher
+        # als DataFrame; reine ndarray-Modelle brauchen ausschließlich numerische Werte
+        feature_values = [data[feature] for feature in FEATURE_NAMES]
+        if NEEDS_DF:
+            model_input = pd.DataFrame([feature_values], columns=FEATURE_NAMES)
+        else:
+            non_numeric_features = []
+            for feature, value in zip(FEATURE_NAMES, feature_values):
+                try:
+                    float(value)
+                except (TypeError, ValueError):
+                    non_numeric_features.append(feature)
+            if non_numeric_features:
+                return {
+                    "error": f"Nicht-numerische Features: {non_numeric_features}",
+                    "required_features": FEATURE_NAMES,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                }, 400
+            model_input = np.array([feature_values], dtype=np.float64)
+        
         # Führe Vorhersage aus
-        prediction = model.predict(input_df[FEATURE_NAMES])[0]
+        prediction = model.predict(model_input)[0]
         
         # Bestimme Risiko-Level
         risk_level = "HIGH" if prediction == 1 else "LOW"
@@ -633,24 +813,79 @@ def predict():
             "timestamp": datetime.now(timezone.utc).isoformat()
         }, 500
 
+@app.route("/v2/polling-interval", methods=["GET", "PUT"])
+def polling_interval():
+    """Liest oder setzt das Basis-Polling-Intervall der Monitoring-Schleife."""
+    global polling_interval_seconds
+    
+    if request.method == "PUT":
+        data = request.get_json(silent=True) or {}
+        try:
+            new_interval = int(data.get("polling_interval_seconds"))
+        except (TypeError, ValueError):
+            new_interval = 0
+        if new_interval < 1:
+            return {
+                "error": "'polling_interval_seconds' muss eine positive ganze Zahl sein",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }, 400
+        polling_interval_seconds = new_interval
+        _monitoring_wakeup.set()
+        logger.info("Polling-Intervall auf %ds gesetzt", polling_interval_seconds)
+    
+    return {
+        "polling_interval_seconds": polling_interval_seconds,
+        "current_interval_seconds": current_polling_interval,
+        "max_interval_seconds": MAX_POLLING_INTERVAL_SECONDS,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+@app.route("/v2/stop", methods=["POST"])
+def stop():
+    """Beendet Monitoring-Schleife und Token-Erneuerung; die Flask-API bleibt erreichbar."""
+    _shutdown.set()
+    _monitoring_wakeup.set()
+    logger.info("Shutdown über /v2/stop angefordert")
+    return {
+        "stopped": True,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
 # =============================================================================
 # MONITORING SCHLEIFE IN SEPARATEM THREAD
 # =============================================================================
 
+def berechne_polling_intervall(consecutive_empty):
+    """
+    Basis-Intervall nach einem Abruf mit Daten; bei aufeinanderfolgenden leeren
+    Abrufen wird es verdoppelt (höchstens 8x, gedeckelt auf MAX_POLLING_INTERVAL_SECONDS).
+    Fehlgeschlagene Abrufe zählen wie leere Abrufe, damit ein gestörtes APM seltener abgefragt wird.
+    """
+    if consecutive_empty == 0:
+        return polling_interval_seconds
+    backoff_interval = polling_interval_seconds * 2 ** min(consecutive_empty, 3)
+    return min(backoff_interval, max(MAX_POLLING_INTERVAL_SECONDS, polling_interval_seconds))
+
 def monitoring_loop():
     """Proaktive Monitoring-Schleife läuft permanent im Hintergrund."""
-    global monitoring_active
+    global monitoring_active, current_polling_interval
     monitoring_active = True
     
-    print(f"INFO: Monitoring gestartet (alle {POLLING_INTERVAL_SECONDS}s)")
+    logger.info("Monitoring gestartet (alle %ds)", polling_interval_seconds)
     last_processed_timestamp = datetime.now(timezone.utc) - timedelta(seconds=POLLING_INTERVAL_SECONDS)
+    consecutive_empty = 0
 
-    while monitoring_active:
+    while not _shutdown.is_set():
         try:
+            # Indikator-Zuordnung bei Bedarf (leer oder abgelaufen) neu laden
+            aktualisiere_indikatoren_bei_bedarf()
+            
             # Hole echte APM-Sensordaten seit letztem Abruf
             sensor_data, new_timestamp = hole_apm_sensor_daten(last_processed_timestamp)
             
             if sensor_data is not None and len(sensor_data) > 0:
+                consecutive_empty = 0
+                
                 # Führe Vorhersage-Analyse durch
                 fuehre_vorhersage_aus(sensor_data)
                 
@@ -660,45 +895,121 @@ def monitoring_loop():
                 else:
                     last_processed_timestamp = datetime.now(timezone.utc)
             else:
+                consecutive_empty += 1
+                
                 # Update timestamp auch wenn keine Daten gefunden wurden
                 if new_timestamp:
                     last_processed_timestamp = new_timestamp
                 else:
                     last_processed_timestamp = datetime.now(timezone.utc)
             
-            time.sleep(POLLING_INTERVAL_SECONDS)
-            
         except Exception as e:
-            print(f"❌ FEHLER in Monitoring-Schleife: {e}")
-            time.sleep(POLLING_INTERVAL_SECONDS)
+            logger.error("❌ FEHLER in Monitoring-Schleife: %s", e)
+            consecutive_empty += 1
+        
+        # Bei wiederholt leeren Abrufen seltener pollen (adaptives Backoff). Unterbrechbares
+        # Warten: bei Shutdown sofort beenden, bei neuem Basis-Intervall die Wartezeit ab dem
+        # letzten Abruf mit dem neuen Intervall neu berechnen
+        waiting_since = time.monotonic()
+        while not _shutdown.is_set():
+            next_interval = berechne_polling_intervall(consecutive_empty)
+            if next_interval != current_polling_interval:
+                logger.info("Polling-Intervall jetzt %ds", next_interval)
+            current_polling_interval = next_interval
+            remaining = waiting_since + current_polling_interval - time.monotonic()
+            if remaining <= 0 or not _monitoring_wakeup.wait(remaining):
+                break
+            _monitoring_wakeup.clear()
+    
+    monitoring_active = False
+    logger.info("Monitoring beendet")
 
 # =============================================================================
 # HAUPTPROGRAMM
 # =============================================================================
 
+def _beende_bei_sigterm(signum, frame):
+    """Signal-Handler: Hintergrund-Schleifen stoppen und den WSGI-Server geordnet beenden."""
+    logger.info("SIGTERM empfangen - fahre Server herunter...")
+    _shutdown.set()
+    _monitoring_wakeup.set()
+    if _stoppe_wsgi_server is not None:
+        _stoppe_wsgi_server()
+
 if __name__ == '__main__':
-    print("🚀 Starte Hybrid Server (Flask + Monitoring)...")
-    
-    # 1. Modell laden
-    model_loaded = lade_modell()
-    
-    # 2. Indikator-Definitionen initialisieren
-    indicators_loaded = initialisiere_indikatoren()
+    logger.info("🚀 Starte Hybrid Server (Flask + Monitoring)...")
+    signal.signal(signal.SIGTERM, _beende_bei_sigterm)
+    
+    # 1.-3. Modell laden, Indikator-Definitionen initialisieren und Netzwerk-Konnektivität
+    # testen - parallel, da alle drei Schritte hauptsächlich auf das Netzwerk warten
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as startup_pool:
+        model_future = startup_pool.submit(lade_modell)
+        indicators_future = startup_pool.submit(initialisiere_indikatoren)
+        connectivity_future = startup_pool.submit(test_network_connectivity)
+    
+    model_loaded = model_future.result()
+    indicators_loaded = indicators_future.result()
     if not indicators_loaded:
-        print("⚠️ Warnung: Indikator-Definitionen konnten nicht geladen werden")
+        logger.warning("⚠️ Warnung: Indikator-Definitionen konnten nicht geladen werden")
+    connectivity_results = connectivity_future.result()
     
-    # 3. Netzwerk-Konnektivität testen
-    connectivity_results = test_network_connectivity()
+    # Access Token ab jetzt im Hintergrund erneuern
+    token_thread = threading.Thread(target=token_refresh_loop, daemon=True)
+    token_thread.start()
     
     # 4. Monitoring-Thread starten (nur wenn Modell geladen)
     if model_loaded:
         monitoring_thread = threading.Thread(target=monitoring_loop, daemon=True)
         monitoring_thread.start()
-        print("✅ Monitoring-Thread gestartet")
+        logger.info("✅ Monitoring-Thread gestartet")
     else:
-        print("⚠️ Monitoring nicht gestartet - Modell konnte nicht geladen werden")
+        logger.warning("⚠️ Monitoring nicht gestartet - Modell konnte nicht geladen werden")
     
-    # 4. Flask-Server starten
+    # 5. Flask-App ausliefern: bevorzugt über den Produktions-WSGI-Server waitress.
+    # Ein einzelner Prozess mit Thread-Pool, damit die Monitoring-Schleife nur einmal läuft.
     port = int(os.getenv('PORT', 5001))
-    print(f"🌐 Starte Flask-Server auf Port {port}...")
-    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+    try:
+        from waitress import create_server
+    except ImportError:
+        from werkzeug.serving import make_server
+        logger.info("🌐 Starte Flask-Server auf Port %d (waitress nicht installiert)...", port)
+        server = make_server('0.0.0.0', port, app, threaded=True)
+        # shutdown() wartet auf das Ende von serve_forever() und darf daher nicht
+        # direkt im Signal-Handler laufen, der selbst im Haupt-Thread ausgeführt wird
+        _stoppe_wsgi_server = lambda: threading.Thread(target=server.shutdown).start()
+        if _shutdown.is_set():  # SIGTERM schon während des Starts empfangen
+            _stoppe_wsgi_server()
+        server.serve_forever()
+        server.server_close()
+    else:
+        logger.info("🌐 Starte waitress-Server auf Port %d mit %d Threads...", port, WSGI_THREADS)
+        server = create_server(app, host='0.0.0.0', port=port, threads=WSGI_THREADS)
+
+        def _verlasse_event_loop(deadline):
+            # Läuft in der Event-Loop von waitress: keine neuen Verbindungen annehmen und
+            # untätige (auch Keep-Alive-)Verbindungen nach dem Senden offener Daten schließen.
+            # Laufende Requests dürfen bis zur Deadline fertig werden, danach wird hart geschlossen.
+            server.del_channel()
+            channels = list(server.active_channels.values())
+            if channels and time.monotonic() < deadline:
+                for channel in channels:
+                    if not channel.requests:
+                        channel.close_when_flushed = True
+                threading.Timer(0.1, server.trigger.pull_trigger,
+                                args=(lambda: _verlasse_event_loop(deadline),)).start()
+            else:
+                for channel in channels:
+                    channel.will_close = True
+                # Ohne Trigger endet run(), sobald die letzten Verbindungen geschlossen sind
+                server.trigger.del_channel()
+
+        # Über den Trigger in der Event-Loop von waitress ausführen, nicht mitten in deren select()
+        _stoppe_wsgi_server = lambda: server.trigger.pull_trigger(
+            lambda: _verlasse_event_loop(time.monotonic() + WSGI_SHUTDOWN_TIMEOUT_S))
+        if _shutdown.is_set():  # SIGTERM schon während des Starts empfangen
+            _stoppe_wsgi_server()
+        server.run()
+        # Laufende Requests hatten bereits bis zur Deadline Zeit - Worker-Threads nur kurz abwarten
+        server.task_dispatcher.shutdown(timeout=1)
+        server.close()
+    logger.info("Server beendet")